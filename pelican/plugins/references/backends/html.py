@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+from pybtex.backends import html
+
+
+class Backend(html.Backend):
+    """HTML backend that adds the id referenceN to the N-th bibliography entry."""
+
+    def write_prologue(self):
+        self.entry_number = 0
+        super().write_prologue()
+
+    def write_entry(self, key: str, label: str, text: str):
+        self.entry_number += 1
+        self.output(f'<dt id="reference{self.entry_number}">{label}</dt>\n')
+        self.output(f"<dd>{text}</dd>\n")
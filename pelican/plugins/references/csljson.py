@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import calendar
+import json
+
+from pybtex.database import BibliographyData, Entry, Person
+from pybtex.exceptions import PybtexError
+
+# bump whenever the conversion output changes, this invalidates cached results
+CONVERTER_VERSION = "2"
+
+ENTRY_TYPES: dict[str, str] = {
+    "article": "article",
+    "article-journal": "article",
+    "article-magazine": "article",
+    "article-newspaper": "article",
+    "book": "book",
+    "chapter": "incollection",
+    "manuscript": "unpublished",
+    "paper-conference": "inproceedings",
+    "report": "techreport",
+    "thesis": "phdthesis",
+}
+
+FIELDS: dict[str, str] = {
+    "title": "title",
+    "collection-title": "series",
+    "volume": "volume",
+    "issue": "number",
+    "page": "pages",
+    "edition": "edition",
+    "publisher-place": "address",
+    "note": "note",
+    "DOI": "doi",
+    "URL": "url",
+    "ISBN": "isbn",
+    "ISSN": "issn",
+}
+
+
+def convert_person(name: dict) -> Person:
+    if "literal" in name:
+        # braces keep institutional names from being split into first and last name
+        return Person(last="{" + name["literal"] + "}")
+
+    # pandoc writes the dropping particle after the given name
+    first = " ".join(
+        part for part in (name.get("given"), name.get("dropping-particle")) if part
+    )
+
+    return Person(
+        first=first,
+        prelast=name.get("non-dropping-particle", ""),
+        last=name.get("family", ""),
+        lineage=name.get("suffix", ""),
+    )
+
+
+def convert_entry(entry: dict) -> Entry:
+    csl_type = entry.get("type", "")
+    entry_type = ENTRY_TYPES.get(csl_type, "misc")
+    if entry_type == "phdthesis" and "master" in entry.get("genre", "").lower():
+        entry_type = "mastersthesis"
+
+    fields: dict[str, str] = {
+        bibtex_field: str(entry[csl_field])
+        for csl_field, bibtex_field in FIELDS.items()
+        if csl_field in entry
+    }
+
+    if "container-title" in entry:
+        if entry_type in ("incollection", "inproceedings"):
+            fields["booktitle"] = str(entry["container-title"])
+        else:
+            fields["journal"] = str(entry["container-title"])
+
+    if "publisher" in entry:
+        if entry_type in ("phdthesis", "mastersthesis"):
+            fields["school"] = str(entry["publisher"])
+        elif entry_type == "techreport":
+            fields["institution"] = str(entry["publisher"])
+        else:
+            fields["publisher"] = str(entry["publisher"])
+
+    issued = entry.get("issued")
+    if not isinstance(issued, dict):
+        issued = {}
+    date_parts = (issued.get("date-parts") or [[]])[0]
+    if date_parts:
+        fields["year"] = str(date_parts[0])
+        if len(date_parts) > 1 and 1 <= int(date_parts[1]) <= 12:
+            fields["month"] = calendar.month_name[int(date_parts[1])]
+    elif "literal" in issued or "raw" in issued:
+        fields["year"] = issued.get("literal", issued.get("raw"))
+
+    return Entry(
+        entry_type,
+        fields=fields,
+        persons={
+            role: [convert_person(name) for name in entry[role]]
+            for role in ("author", "editor")
+            if role in entry
+        },
+    )
+
+
+def to_bibtex(data: str) -> str:
+    """Convert a CSL-JSON bibliography to BibTeX without calling pandoc.
+
+    Raises a ValueError if the data is not a list of CSL-JSON entries or cannot be
+    converted.
+    """
+    entries = json.loads(data)
+    if not isinstance(entries, list):
+        raise ValueError("CSL-JSON bibliography must be a list of entries")
+
+    bib_data = BibliographyData()
+    try:
+        for entry in entries:
+            if not isinstance(entry, dict) or "id" not in entry:
+                raise ValueError(f"invalid CSL-JSON entry: {entry}")
+            bib_data.add_entry(str(entry["id"]), convert_entry(entry))
+
+        return bib_data.to_string("bibtex").strip()
+    except (AttributeError, IndexError, KeyError, TypeError, PybtexError) as error:
+        raise ValueError(f"failed to convert CSL-JSON bibliography: {error}") from error
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from weakref import WeakKeyDictionary
+
+from pybtex.style import FormattedBibliography, FormattedEntry
+
+INLINE_LINK = '<a href="#reference{number}">{label}</a>'
+
+_ENTRY_INDICES: WeakKeyDictionary[
+    FormattedBibliography,
+    dict[str, tuple[int, FormattedEntry]],
+] = WeakKeyDictionary()
+
+
+def index_entries(
+    bibliography: FormattedBibliography,
+) -> dict[str, tuple[int, FormattedEntry]]:
+    """Map each citekey to the position and entry in the bibliography.
+
+    The mapping is built once per bibliography and reused afterwards.
+    """
+    try:
+        return _ENTRY_INDICES[bibliography]
+    except KeyError:
+        pass
+
+    key_index = {entry.key: (index, entry) for index, entry in enumerate(bibliography)}
+    _ENTRY_INDICES[bibliography] = key_index
+    return key_index
@@ -3,6 +3,8 @@ from __future__ import annotations
 from pybtex.style import FormattedBibliography, FormattedEntry
 from pybtex.style.labels import BaseLabelStyle
 
+from pelican.plugins.references.labels import INLINE_LINK, index_entries
+
 
 class LabelStyle(BaseLabelStyle):
     def format_labels(self, sorted_entries: FormattedEntry):
@@ -14,19 +16,12 @@ class LabelStyle(BaseLabelStyle):
         citekeys: list[str],
         bibliography: FormattedBibliography,
     ) -> str:
-        stripped_labels: list[str] = []
-        indices: list[int] = []
-
-        for citekey in citekeys:
-            for index, entry in enumerate(bibliography.entries):
-                if entry.key == citekey:
-                    stripped_labels.append(entry.label.lstrip("[").rstrip("]"))
-                    indices.append(index)
-                    break
-            else:
-                raise KeyError(citekey)
-        links = [
-            f'<a href="#reference{index+1}">{label}</a>'
-            for index, label in zip(indices, stripped_labels)
-        ]
-        return "<sup>[" + ", ".join(links) + "]</sup>"
+        key_index = index_entries(bibliography)
+        links = ", ".join(
+            INLINE_LINK.format(
+                number=index + 1,
+                label=entry.label.lstrip("[").rstrip("]"),
+            )
+            for index, entry in map(key_index.__getitem__, citekeys)
+        )
+        return f"<sup>[{links}]</sup>"
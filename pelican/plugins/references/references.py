@@ -1,55 +1,296 @@
 from __future__ import annotations
 
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import functools
+import hashlib
 import io
+import itertools
+import json
 import logging
+import os
 from pathlib import Path
 import re
+import shutil
 import subprocess
+import tempfile
+import uuid
 
-from bs4 import BeautifulSoup
+from pybtex.database.input.bibtex import Parser
 from pybtex.plugin import find_plugin, register_plugin
 from pybtex.style import FormattedBibliography
+from pybtex.style.formatting import BaseStyle
+from pybtex.style.labels import BaseLabelStyle
 
 from pelican import ArticlesGenerator, PagesGenerator, signals
 from pelican.contents import Article, Page
 import pelican.generators
-from pelican.plugins.references.labels import number_brackets
+from pelican.plugins.references import csljson
+from pelican.plugins.references.backends.html import Backend
+from pelican.plugins.references.labels import (
+    INLINE_LINK,
+    index_entries,
+    number_brackets,
+)
+from pelican.plugins.references.settings import PelicanReferencesSettings
 
 register_plugin("pybtex.style.labels", "number_brackets", number_brackets.LabelStyle)
 
 LOGGER = logging.getLogger(__name__)
 
-REGEX_CITATION = re.compile(r"\[@([\w\d]+)\]", re.MULTILINE)
+_STAT_CACHE: dict[Path, tuple[Path, os.stat_result] | None] = {}
 
+REGEX_BIBTEX_ENTRY = re.compile(r"^(?=@)", re.MULTILINE)
 
-def read_bibliography(content: Article | Page) -> str:
+try:
+    # linear-time matching if google-re2 is installed
+    import re2
+
+    REGEX_CITATION = re2.compile(r"\[@([A-Za-z0-9_]+)\]")
+except ImportError:
+    REGEX_CITATION = re.compile(r"\[@([A-Za-z0-9_]+)\]")
+
+
+def bibliography_path(content: Article | Page) -> Path | None:
     if "bibliography" not in content.metadata:
+        return None
+
+    return Path(content.source_path).parent / content.metadata["bibliography"]
+
+
+@functools.lru_cache(maxsize=32)
+def guess_bibformat(extension: str) -> str:
+    if extension.lower().lstrip(".") == "json":
+        return "csljson"
+
+    return "bibtex"
+
+
+def convert_csljson(data: str) -> str:
+    try:
+        return csljson.to_bibtex(data)
+    except ValueError:
+        if shutil.which("pandoc") is None:
+            raise
+
+    return (
+        subprocess.check_output(
+            [
+                "pandoc",
+                "--from=csljson",
+                "--to=bibtex",
+                "--output=-",
+            ],
+            input=data.encode(),
+        )
+        .decode()
+        .strip()
+    )
+
+
+@functools.lru_cache(maxsize=128)
+def _load_bibliography(path: str, mtime: float, bibformat: str) -> str:
+    # mtime is only part of the cache key so that edited files are read again
+    with open(path, encoding="utf-8") as fptr:
+        bibcontent = fptr.read()
+
+    if bibformat == "csljson":
+        try:
+            bibcontent = convert_csljson(bibcontent)
+        except (ValueError, subprocess.CalledProcessError):
+            LOGGER.error(f"failed to convert CSL-JSON bibliography: {path}")
+            return ""
+
+    return bibcontent
+
+
+def _convert_with_pandoc(paths: list[Path]) -> dict[Path, str]:
+    """Convert CSL-JSON bibliographies to BibTeX using a single pandoc call.
+
+    The entries of all files are merged into one document. Each citekey is prefixed
+    with a random token and the index of its file so that the BibTeX output can be
+    split up again (this also keeps identical citekeys in different files apart).
+    """
+    token = uuid.uuid4().hex
+    merged: list[dict] = []
+    try:
+        for index, path in enumerate(paths):
+            with open(path, encoding="utf-8") as fptr:
+                for entry in json.load(fptr):
+                    merged.append({**entry, "id": f"{token}{index}-{entry['id']}"})
+
+        output = subprocess.run(
+            [
+                "pandoc",
+                "--from=csljson",
+                "--to=bibtex",
+                "--output=-",
+            ],
+            input=json.dumps(merged).encode(),
+            stdout=subprocess.PIPE,
+            check=True,
+        ).stdout.decode()
+    except (OSError, ValueError, KeyError, TypeError, subprocess.CalledProcessError):
+        LOGGER.warning("batch conversion of bibliographies failed", exc_info=True)
+        return {}
+
+    entries: list[list[str]] = [[] for _ in paths]
+    regex_key = re.compile(rf"@\w+\{{{token}(\d+)-")
+    for entry in REGEX_BIBTEX_ENTRY.split(output):
+        match = regex_key.match(entry)
+        if match is None:
+            continue
+        entries[int(match.group(1))].append(
+            entry[: match.start(1) - len(token)] + entry[match.end() :],
+        )
+
+    return {
+        path: "".join(file_entries).strip()
+        for path, file_entries in zip(paths, entries)
+    }
+
+
+def _read_cache(cache_file: Path) -> str | None:
+    try:
+        return cache_file.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+    except (OSError, UnicodeDecodeError):
+        LOGGER.warning(f"failed to read bibliography cache: {cache_file}")
+        return None
+
+
+def _write_cache(cache_file: Path, bibliography: str):
+    # write to a temporary file first so that interrupted or concurrent builds never
+    # leave a truncated entry behind
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(
+            prefix=f".{cache_file.name}.",
+            dir=cache_file.parent,
+        )
+    except OSError:
+        LOGGER.warning(f"failed to write bibliography cache: {cache_file}")
+        return
+
+    try:
+        with open(fd, "w", encoding="utf-8") as fptr:
+            fptr.write(bibliography)
+        os.replace(temporary, cache_file)
+    except OSError:
+        LOGGER.warning(f"failed to write bibliography cache: {cache_file}")
+        with contextlib.suppress(OSError):
+            os.unlink(temporary)
+
+
+def convert_bibliographies(
+    paths: Iterable[Path],
+    cache_dir: Path | None = None,
+) -> dict[Path, str]:
+    """Convert CSL-JSON bibliographies to BibTeX.
+
+    The conversion is done in-process with pybtex. Files that cannot be converted
+    this way are handed to pandoc (if installed) in a single batch.
+
+    If cache_dir is given, results are stored there under the SHA-256 hash of the
+    converter version and the file contents and reused by later builds as long as
+    neither changes.
+    """
+    bibliographies: dict[Path, str] = {}
+    cache_files: dict[Path, Path] = {}
+    remaining: list[Path] = []
+    for path in paths:
+        with open(path, "rb") as fptr:
+            data = fptr.read()
+
+        if cache_dir is not None:
+            # the converter version is hashed too so that converter fixes apply
+            digest = hashlib.sha256(csljson.CONVERTER_VERSION.encode() + b"\0" + data)
+            cache_file = cache_dir / f"{digest.hexdigest()}.bib"
+            cached = _read_cache(cache_file)
+            if cached is not None:
+                bibliographies[path] = cached
+                continue
+            cache_files[path] = cache_file
+
+        try:
+            bibliographies[path] = csljson.to_bibtex(data.decode())
+        except ValueError:
+            remaining.append(path)
+
+    if remaining and shutil.which("pandoc") is not None:
+        bibliographies.update(_convert_with_pandoc(remaining))
+
+    for path, cache_file in cache_files.items():
+        if path in bibliographies:
+            _write_cache(cache_file, bibliographies[path])
+
+    return bibliographies
+
+
+def stat_bibliography(path: Path) -> tuple[Path, os.stat_result]:
+    """Resolve and stat a bibliography path, caching the result.
+
+    Raises FileNotFoundError if the file does not exist or cannot be accessed. The
+    cache is cleared at the start of each build by ReferencesProcessor.
+    """
+    try:
+        result = _STAT_CACHE[path]
+    except KeyError:
+        try:
+            result = (path.resolve(), path.stat())
+        except OSError:
+            # like Path.exists(), treat any path error as a missing file
+            result = None
+        _STAT_CACHE[path] = result
+
+    if result is None:
+        raise FileNotFoundError(path)
+    return result
+
+
+def read_bibliography(
+    content: Article | Page,
+    bibliographies: dict[Path, str] | None = None,
+) -> str:
+    path = bibliography_path(content)
+    if path is None:
         return ""
 
-    path = Path(content.source_path).parent / content.metadata["bibliography"]
-    if not path.exists():
+    try:
+        path, stat_result = stat_bibliography(path)
+    except FileNotFoundError:
         LOGGER.error(f"bibliography file does not exist: {path}")
         return ""
 
-    with open(path) as fptr:
-        bibcontent = fptr.read()
+    if bibliographies and path in bibliographies:
+        return bibliographies[path]
 
-    if path.suffix.lower().lstrip().strip() == "json":
-        bibcontent = (
-            subprocess.check_output(
-                [
-                    "pandoc",
-                    "--from=csljson",
-                    "--to=bibtex",
-                    "--output=-",
-                ],
-                input=bibcontent.encode(),
-            )
-            .decode()
-            .strip()
-        )
+    return _load_bibliography(
+        str(path),
+        stat_result.st_mtime,
+        guess_bibformat(path.suffix),
+    )
 
-    return bibcontent
+
+@functools.cache
+def formatting_style(
+    bibliography_style: str,
+    label_style: str,
+    name_style: str,
+    sorting_style: str,
+) -> BaseStyle:
+    return find_plugin("pybtex.style.formatting", bibliography_style)(
+        label_style=label_style,
+        sorting_style=sorting_style,
+        name_style=name_style,
+    )
+
+
+@functools.cache
+def label_plugin(label_style: str) -> BaseLabelStyle:
+    return find_plugin("pybtex.style.labels", label_style)()
 
 
 def format_bibliography(
@@ -60,33 +301,36 @@ def format_bibliography(
     name_style: str = "plain",
     sorting_style: str = "none",
 ) -> FormattedBibliography:
-    from pybtex.database.input.bibtex import Parser
-    from pybtex.plugin import find_plugin
-    from pybtex.style.formatting import BaseStyle
+    return _format_bibliography(
+        bibliography,
+        tuple(citations),
+        bibliography_style,
+        label_style,
+        name_style,
+        sorting_style,
+    )
+
 
+@functools.lru_cache(maxsize=128)
+def _format_bibliography(
+    bibliography: str,
+    citations: tuple[str, ...],
+    bibliography_style: str,
+    label_style: str,
+    name_style: str,
+    sorting_style: str,
+) -> FormattedBibliography:
+    # the citation order is part of the key since it determines the numbering
     bib_data = Parser(wanted_entries=citations).parse_string(bibliography)
 
-    style: BaseStyle = find_plugin("pybtex.style.formatting", bibliography_style)(
-        label_style=label_style,
-        sorting_style=sorting_style,
-        name_style=name_style,
-    )
+    style = formatting_style(bibliography_style, label_style, name_style, sorting_style)
 
-    return style.format_bibliography(bib_data, citations)
+    return style.format_bibliography(bib_data, list(citations))
 
 
 def render_bibliography(formatted_bibliography: FormattedBibliography) -> str:
-    from pybtex.backends.html import Backend
-
     backend = Backend()
-    html = backend.write_to_file(formatted_bibliography, io.StringIO())
-
-    # add ids for each reference
-    soup = BeautifulSoup(html, "html.parser")
-    for index, tag in enumerate(soup.find_all("dt")):
-        tag["id"] = f"reference{index+1}"
-
-    return str(soup)
+    return backend.write_to_file(formatted_bibliography, io.StringIO())
 
 
 class Citation:
@@ -99,42 +343,33 @@ class Citation:
         return str({"start": self.start, "end": self.end, "citekeys": self.citekeys})
 
 
-def find_citations(content: Article | Page) -> list[Citation]:
-    matches: list[re.Match] = list(REGEX_CITATION.finditer(content._content))
+def find_citations(content: Article | Page) -> tuple[list[Citation], list[str]]:
+    """Find all citations and the cited keys in order of their first citation."""
+    if "[@" not in content._content:
+        return [], []
+
     citations: list[Citation] = []
+    citekeys: dict[str, None] = {}
 
-    for match in matches:
-        citations.append(
-            Citation(
-                match.start(),
-                match.end(),
-                [citekey.strip().lstrip("@") for citekey in match.group(1).split(",")],
-            ),
-        )
+    for match in REGEX_CITATION.finditer(content._content):
+        # REGEX_CITATION matches exactly one citekey without whitespace
+        citekey = match.group(1)
+        citations.append(Citation(match.start(), match.end(), [citekey]))
+        citekeys.setdefault(citekey, None)
 
-    return citations
+    return citations, list(citekeys)
 
 
 def inline_label_fallback(
     citekeys: list[str],
     bibliography: FormattedBibliography,
 ) -> str:
-    labels: list[str] = []
-    indices: list[int] = []
-
-    for citekey in citekeys:
-        for index, entry in enumerate(bibliography.entries):
-            if entry.key == citekey:
-                labels.append(entry.label)
-                indices.append(index)
-                break
-        else:
-            raise KeyError(citekey)
-    links = [
-        f'<a href="#reference{index+1}">{label}</a>'
-        for index, label in zip(indices, labels)
-    ]
-    return "<sup>" + ", ".join(links) + "</sup>"
+    key_index = index_entries(bibliography)
+    links = ", ".join(
+        INLINE_LINK.format(number=index + 1, label=entry.label)
+        for index, entry in map(key_index.__getitem__, citekeys)
+    )
+    return f"<sup>{links}</sup>"
 
 
 def replace_citations(
@@ -143,38 +378,59 @@ def replace_citations(
     formatted_bibliography: FormattedBibliography,
     label_style: str = "number_brackets",
 ):
-    label_plugin = find_plugin("pybtex.style.labels", label_style)()
-    for citation in reversed(citations):
+    label_formatter = label_plugin(label_style)
+    parts: list[str] = []
+    position = 0
+    for citation in citations:
         try:
-            label = label_plugin.inline_label(citation.citekeys, formatted_bibliography)
+            label = label_formatter.inline_label(
+                citation.citekeys,
+                formatted_bibliography,
+            )
         except AttributeError:
-            label = inline_label_fallback(citation.citekeys, formatted_bibliography)
-        content._content = (
-            content._content[: citation.start]
-            + label
-            + content._content[citation.end :]
-        )
+            label = inline_label_fallback(
+                citation.citekeys,
+                formatted_bibliography,
+            )
+        parts.append(content._content[position : citation.start])
+        parts.append(label)
+        position = citation.end
+    parts.append(content._content[position:])
+    content._content = "".join(parts)
 
 
-def process_content(content: Article | Page):
+def cites_bibliography(content: Article | Page) -> bool:
     if "bibliography" not in content.metadata:
+        return False
+
+    # cheap check that avoids reading the bibliography and running the regex
+    if "[@" not in content._content:
+        LOGGER.warning(f"no citations in article: {content.source_path}")
+        return False
+
+    return True
+
+
+def process_content(
+    content: Article | Page,
+    bibliographies: dict[Path, str] | None = None,
+):
+    if not cites_bibliography(content):
         return
 
-    bibliography = read_bibliography(content)
+    bibliography = read_bibliography(content, bibliographies)
     if not bibliography:
         return
 
-    citations = find_citations(content)
+    insert_references(content, bibliography)
+
+
+def insert_references(content: Article | Page, bibliography: str):
+    citations, citekeys = find_citations(content)
     if not citations:
         LOGGER.warning(f"no citations in article: {content.source_path}")
         return
 
-    citekeys = []
-    for citation in citations:
-        for citekey in citation.citekeys:
-            if citekey not in citekeys:
-                citekeys.append(citekey)
-
     formatted_bib = format_bibliography(bibliography, citekeys)
     rendered_bib = render_bibliography(formatted_bib)
 
@@ -183,38 +439,126 @@ def process_content(content: Article | Page):
     content._content += rendered_bib
 
 
+class DetachedContent:
+    """Picklable copy of the parts of an article or page used by this plugin."""
+
+    def __init__(self, content: Article | Page):
+        self.source_path: str = content.source_path
+        self.metadata: dict = {"bibliography": content.metadata["bibliography"]}
+        self._content: str = content._content
+
+
+# bibliographies of a worker process, keyed by resolved path
+_WORKER_BIBLIOGRAPHIES: dict[Path, str] = {}
+
+
+def _init_worker(bibliographies: dict[Path, str]):
+    _WORKER_BIBLIOGRAPHIES.update(bibliographies)
+
+
+def _insert_references_detached(job: tuple[DetachedContent, Path]) -> str:
+    content, path = job
+    insert_references(content, _WORKER_BIBLIOGRAPHIES[path])
+    return content._content
+
+
 class ReferencesProcessor:
     def __init__(self, generators: list[pelican.generators.Generator]):
-        self.generators: list[ArticlesGenerator | PagesGenerator] = [
-            generator
-            for generator in generators
-            if isinstance(generator, ArticlesGenerator)
-            or isinstance(generator, PagesGenerator)
-        ]
-
-    def process(self):
-        for generator in self.generators:
+        self.article_generators: list[ArticlesGenerator] = []
+        self.page_generators: list[PagesGenerator] = []
+        settings: dict = {}
+        for generator in generators:
             if isinstance(generator, ArticlesGenerator):
-                articles: list[Article] = (
-                    generator.articles
-                    + generator.translations
-                    + generator.drafts
-                    + generator.drafts_translations
-                )
+                self.article_generators.append(generator)
+            elif isinstance(generator, PagesGenerator):
+                self.page_generators.append(generator)
+            else:
+                continue
+            settings = generator.settings
+        self.settings = PelicanReferencesSettings.from_dict(settings)
+
+        # bibliography files may have changed since the last build
+        _STAT_CACHE.clear()
+
+        # convert all CSL-JSON bibliographies up front
+        json_paths: dict[Path, None] = {}
+        for content in self.contents():
+            path = bibliography_path(content)
+            if path is None or guess_bibformat(path.suffix) != "csljson":
+                continue
+            try:
+                json_paths[stat_bibliography(path)[0]] = None
+            except FileNotFoundError:
+                continue
+        self._bib_cache: dict[Path, str] = convert_bibliographies(
+            json_paths,
+            None if self.settings.cache_dir is None else Path(self.settings.cache_dir),
+        )
 
-                for article in articles:
-                    process_content(article)
+    def contents(self) -> Iterator[Article | Page]:
+        for article_generator in self.article_generators:
+            yield from itertools.chain(
+                article_generator.articles,
+                article_generator.translations,
+                article_generator.drafts,
+                article_generator.drafts_translations,
+            )
 
-            elif isinstance(generator, PagesGenerator):
-                pages: list[Page] = (
-                    generator.pages
-                    + generator.translations
-                    + generator.draft_pages
-                    + generator.draft_translations
-                )
-
-                for page in pages:
-                    process_content(page)
+        for page_generator in self.page_generators:
+            yield from itertools.chain(
+                page_generator.pages,
+                page_generator.translations,
+                page_generator.draft_pages,
+                page_generator.draft_translations,
+            )
+
+    def process(self):
+        if self.settings.parallel:
+            self.process_parallel()
+            return
+
+        for content in self.contents():
+            process_content(content, self._bib_cache)
+
+    def process_parallel(self):
+        # bibliographies are read here so that the caches are shared, each unique
+        # bibliography is sent to every worker once instead of with every job
+        bibliographies: dict[Path, str] = {}
+        targets: list[Article | Page] = []
+        jobs: list[tuple[DetachedContent, Path]] = []
+        for content in self.contents():
+            if not cites_bibliography(content):
+                continue
+
+            bibliography = read_bibliography(content, self._bib_cache)
+            if not bibliography:
+                continue
+
+            path = stat_bibliography(bibliography_path(content))[0]
+            bibliographies[path] = bibliography
+            targets.append(content)
+            jobs.append((DetachedContent(content), path))
+
+        if len(jobs) < 2:
+            for content, (_, path) in zip(targets, jobs):
+                insert_references(content, bibliographies[path])
+            return
+
+        max_workers = min(os.cpu_count() or 1, len(jobs))
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(bibliographies,),
+        ) as executor:
+            for content, text in zip(
+                targets,
+                executor.map(
+                    _insert_references_detached,
+                    jobs,
+                    chunksize=max(1, len(jobs) // (4 * max_workers)),
+                ),
+            ):
+                content._content = text
 
 
 def add_references(generators: list[pelican.generators.Generator]):
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import os
+
 from pelican import Pelican
 
 
@@ -7,17 +9,31 @@ class PelicanReferencesSettings:
     def __init__(self):
         self.citestyle: str = "numeric"
         self.bibstyle: str = "default"
+        self.parallel: bool = False
+        self.cache_dir: str | None = None
 
     @staticmethod
     def from_settings(pelican: Pelican) -> PelicanReferencesSettings:
+        return PelicanReferencesSettings.from_dict(pelican.settings)
+
+    @staticmethod
+    def from_dict(pelican_settings: dict) -> PelicanReferencesSettings:
         obj = PelicanReferencesSettings()
 
-        settings = pelican.settings.get("REFERENCES", None)
+        settings = pelican_settings.get("REFERENCES", None)
 
         if settings is None:
             return obj
 
         obj.citestyle = settings.get("citestyle", obj.citestyle)
         obj.bibstyle = settings.get("bibstyle", obj.bibstyle)
+        obj.parallel = settings.get("parallel", obj.parallel)
+        obj.cache_dir = settings.get("cache_dir", obj.cache_dir)
+        if obj.cache_dir is not None:
+            # relative to Pelican's CACHE_PATH like the other caches of a site
+            obj.cache_dir = os.path.join(
+                pelican_settings.get("CACHE_PATH", "cache"),
+                obj.cache_dir,
+            )
 
         return obj
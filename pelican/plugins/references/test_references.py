@@ -1,2 +1,234 @@
-def test_dummy():
-    pass
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from pelican import ArticlesGenerator
+from pelican.plugins.references import csljson, references
+from pelican.plugins.references.settings import PelicanReferencesSettings
+
+
+def make_content(source_path, text="", bibliography=None):
+    metadata = {} if bibliography is None else {"bibliography": bibliography}
+    return SimpleNamespace(
+        source_path=str(source_path), metadata=metadata, _content=text
+    )
+
+
+def test_read_bibliography_cached(tmp_path):
+    bibfile = tmp_path / "refs.bib"
+    bibfile.write_text("@misc{key, title = {Title}}")
+    references._load_bibliography.cache_clear()
+
+    first = references.read_bibliography(
+        make_content(tmp_path / "a.md", bibliography="refs.bib")
+    )
+    second = references.read_bibliography(
+        make_content(tmp_path / "b.md", bibliography="refs.bib")
+    )
+
+    assert first == second == "@misc{key, title = {Title}}"
+    assert references._load_bibliography.cache_info().hits == 1
+
+
+def test_read_bibliography_missing(tmp_path):
+    content = make_content(tmp_path / "a.md", bibliography="missing.bib")
+    assert references.read_bibliography(content) == ""
+
+
+def test_convert_bibliographies_single_pandoc_call(tmp_path, monkeypatch):
+    paths = []
+    for index in range(2):
+        path = tmp_path / f"refs{index}.json"
+        path.write_text(f'[{{"id": "key", "title": "Title {index}"}}]')
+        paths.append(path)
+
+    calls = []
+
+    def fake_run(args, input, **kwargs):
+        calls.append(args)
+        entries = [
+            f"@misc{{{entry['id']},\n  title = {{{entry['title']}}}\n}}\n"
+            for entry in json.loads(input)
+        ]
+        return SimpleNamespace(stdout="".join(entries).encode())
+
+    monkeypatch.setattr(references.subprocess, "run", fake_run)
+
+    bibliographies = references._convert_with_pandoc(paths)
+
+    assert len(calls) == 1
+    assert bibliographies == {
+        paths[0]: "@misc{key,\n  title = {Title 0}\n}",
+        paths[1]: "@misc{key,\n  title = {Title 1}\n}",
+    }
+
+
+def test_csljson_to_bibtex():
+    bibtex = csljson.to_bibtex(
+        json.dumps(
+            [
+                {
+                    "id": "doe2020",
+                    "type": "paper-conference",
+                    "author": [
+                        {"family": "Doe", "given": "Jane"},
+                        {"literal": "World Health Organization"},
+                        {
+                            "family": "Beethoven",
+                            "given": "Ludwig",
+                            "dropping-particle": "van",
+                        },
+                    ],
+                    "title": "Title",
+                    "container-title": "Proceedings",
+                    "issued": {"date-parts": [[2020, 5]]},
+                },
+            ],
+        ),
+    )
+
+    assert bibtex.startswith("@inproceedings{doe2020,")
+    assert (
+        'author = "Doe, Jane and {World Health Organization} and Beethoven, Ludwig van"'
+        in bibtex
+    )
+    assert 'booktitle = "Proceedings"' in bibtex
+    assert 'year = "2020"' in bibtex
+    assert 'month = "May"' in bibtex
+
+
+def test_process_content(tmp_path):
+    bibfile = tmp_path / "refs.bib"
+    bibfile.write_text(
+        "@misc{first, title = {First}}\n@misc{second, title = {Second}}\n",
+    )
+    content = make_content(
+        tmp_path / "a.md",
+        "See [@second], [@first] and [@second].",
+        bibliography="refs.bib",
+    )
+
+    references.process_content(content)
+
+    link1 = '<sup>[<a href="#reference1">1</a>]</sup>'
+    link2 = '<sup>[<a href="#reference2">2</a>]</sup>'
+    assert content._content.startswith(f"See {link1}, {link2} and {link1}.")
+    assert '<dt id="reference1">[1]</dt>' in content._content
+
+
+def test_process_parallel(tmp_path):
+    bibfile = tmp_path / "refs.bib"
+    bibfile.write_text("@misc{first, title = {First}}\n")
+    contents = [
+        make_content(tmp_path / f"{index}.md", "See [@first].", "refs.bib")
+        for index in range(3)
+    ]
+    contents.append(make_content(tmp_path / "other.md", "No references."))
+
+    generator = ArticlesGenerator.__new__(ArticlesGenerator)
+    generator.settings = {"REFERENCES": {"parallel": True}}
+    generator.articles = contents
+    generator.translations = []
+    generator.drafts = []
+    generator.drafts_translations = []
+
+    references.ReferencesProcessor([generator]).process()
+
+    for content in contents[:3]:
+        assert content._content.startswith(
+            'See <sup>[<a href="#reference1">1</a>]</sup>.',
+        )
+    assert contents[3]._content == "No references."
+
+
+def test_convert_bibliographies_disk_cache(tmp_path, monkeypatch):
+    path = tmp_path / "refs.json"
+    path.write_text('[{"id": "key", "title": "Title"}]')
+    cache_dir = tmp_path / "cache"
+
+    first = references.convert_bibliographies([path], cache_dir)
+    assert len(list(cache_dir.iterdir())) == 1
+
+    def fail(data):
+        raise AssertionError("bibliography converted again")
+
+    monkeypatch.setattr(references.csljson, "to_bibtex", fail)
+    assert references.convert_bibliographies([path], cache_dir) == first
+
+
+def test_csljson_to_bibtex_malformed():
+    for entry in (
+        {"id": "key", "issued": {"date-parts": []}},
+        {"id": "key", "issued": "2020"},
+    ):
+        assert csljson.to_bibtex(json.dumps([entry])).startswith("@misc{key")
+
+    with pytest.raises(ValueError):
+        csljson.to_bibtex(json.dumps([{"id": "key", "title": "x {y"}]))
+
+
+def test_read_bibliography_malformed_csljson(tmp_path, monkeypatch):
+    monkeypatch.setattr(references.shutil, "which", lambda name: None)
+    (tmp_path / "refs.json").write_text('[{"id": "key", "title": "x {y"}]')
+
+    assert references.convert_bibliographies([tmp_path / "refs.json"]) == {}
+    content = make_content(tmp_path / "a.md", bibliography="refs.json")
+    assert references.read_bibliography(content) == ""
+
+
+def test_convert_bibliographies_corrupt_cache(tmp_path):
+    path = tmp_path / "refs.json"
+    path.write_text('[{"id": "key", "title": "Title"}]')
+    cache_dir = tmp_path / "cache"
+
+    expected = references.convert_bibliographies([path], cache_dir)
+    for cache_file in cache_dir.iterdir():
+        cache_file.write_bytes(b"\xff\xfe\xfa")
+
+    assert references.convert_bibliographies([path], cache_dir) == expected
+
+
+def test_settings_cache_dir_relative_to_cache_path():
+    settings = PelicanReferencesSettings.from_dict(
+        {"CACHE_PATH": "/site/cache", "REFERENCES": {"cache_dir": "references"}},
+    )
+    assert settings.cache_dir == "/site/cache/references"
+
+
+def test_replace_citations_two_argument_inline_label(tmp_path, monkeypatch):
+    class LabelStyle:
+        def inline_label(self, citekeys, bibliography):
+            return "+".join(citekeys)
+
+    monkeypatch.setattr(references, "label_plugin", lambda label_style: LabelStyle())
+    content = make_content(tmp_path / "a.md", "See [@first].")
+    citations, citekeys = references.find_citations(content)
+    bibliography = references.format_bibliography("@misc{first, title = {F}}", citekeys)
+
+    references.replace_citations(content, citations, bibliography)
+
+    assert content._content == "See first."
+
+
+def test_read_bibliography_not_a_directory(tmp_path):
+    (tmp_path / "refs.bib").write_text("@misc{key, title = {Title}}")
+    content = make_content(tmp_path / "a.md", "[@key]", "refs.bib/oops.bib")
+
+    assert references.read_bibliography(content) == ""
+    references.process_content(content)
+    assert content._content == "[@key]"
+
+
+def test_convert_bibliographies_cache_write_is_atomic(tmp_path, monkeypatch):
+    path = tmp_path / "refs.json"
+    path.write_text('[{"id": "key", "title": "Title"}]')
+    cache_dir = tmp_path / "cache"
+
+    def interrupted(source, destination):
+        raise OSError("interrupted")
+
+    monkeypatch.setattr(references.os, "replace", interrupted)
+    references.convert_bibliographies([path], cache_dir)
+
+    assert list(cache_dir.iterdir()) == []